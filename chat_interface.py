@@ -6,8 +6,12 @@ Chat Interface Module - Fixed Version
 """
 
 import os
+import orjson
+import requests
 import streamlit as st
-from src.api.gemini_handler import get_model, send_message, validate_api_connection
+from src.api.gemini_handler import (
+    get_model, validate_api_connection, clear_model_cache
+)
 from src.utils.session import (
     create_session, add_message, get_history_for_api,
     get_message_count, clear_session
@@ -22,21 +26,23 @@ def _init_session_state(config: dict) -> None:
     """Initialize all Streamlit session state variables."""
     if "session" not in st.session_state:
         st.session_state.session = create_session()
+        # Formatted once - the id never changes for the session's lifetime.
+        st.session_state.session_id_caption = (
+            f"Session ID: `{st.session_state.session.session_id}`"
+        )
         logger.info(f"New session started: {st.session_state.session.session_id}")
 
-    if "model" not in st.session_state:
+    if "api_ready" not in st.session_state:
         try:
-            st.session_state.model = get_model()
+            get_model()  # cached across sessions; just validates it builds
             st.session_state.api_ready = True
             st.session_state.api_error = None
         except EnvironmentError as e:
             st.session_state.api_ready = False
             st.session_state.api_error = str(e)
-            st.session_state.model = None
         except Exception as e:
             st.session_state.api_ready = False
             st.session_state.api_error = f"[{type(e).__name__}] {str(e)}"
-            st.session_state.model = None
 
     if "messages_display" not in st.session_state:
         st.session_state.messages_display = [
@@ -44,88 +50,111 @@ def _init_session_state(config: dict) -> None:
         ]
 
 
+# Precompiled (keywords, hint) table: first match wins, checked in order while
+# the API-down panel re-renders every rerun.
+_HINTS: tuple[tuple[tuple[str, ...], str], ...] = (
+    (("api_key", "api key", "invalid key"),
+     "🔑 **Fix:** Your `GEMINI_API_KEY` is invalid. Get a valid key at https://aistudio.google.com/apikey and update your `.env` file."),
+    (("permission", "403"),
+     "🔒 **Fix:** API key doesn't have permission. Make sure the Gemini API is enabled in your Google Cloud project."),
+    (("quota", "exhausted", "429"),
+     "⏱️ **Fix:** Rate limit hit. Wait 1 minute and try again, or check your quota at https://aistudio.google.com"),
+    (("not found", "404", "model"),
+     "🤖 **Fix:** Model not found. Open `config.yaml` and change `model` to `gemini-1.5-flash` or `gemini-pro`."),
+    (("network", "connection", "timeout"),
+     "🌐 **Fix:** Network error. Check your internet connection and try again."),
+    (("environment", "gemini_api_key"),
+     "🔑 **Fix:** `GEMINI_API_KEY` is not set. Create a `.env` file with `GEMINI_API_KEY=your_key_here`."),
+)
+
+_DEFAULT_HINT = "📋 **Fix:** Copy the error above and check the Gemini API documentation."
+
+
 def _get_error_hint(error_str: str) -> str:
     """Return a human-friendly fix based on the error type."""
     e = error_str.lower()
-    if "api_key" in e or "api key" in e or "invalid" in e and "key" in e:
-        return "🔑 **Fix:** Your `GEMINI_API_KEY` is invalid. Get a valid key at https://aistudio.google.com/apikey and update your `.env` file."
-    if "permission" in e or "403" in e:
-        return "🔒 **Fix:** API key doesn't have permission. Make sure the Gemini API is enabled in your Google Cloud project."
-    if "quota" in e or "exhausted" in e or "429" in e:
-        return "⏱️ **Fix:** Rate limit hit. Wait 1 minute and try again, or check your quota at https://aistudio.google.com"
-    if "not found" in e or "404" in e or "model" in e:
-        return "🤖 **Fix:** Model not found. Open `config.yaml` and change `model` to `gemini-1.5-flash` or `gemini-pro`."
-    if "network" in e or "connection" in e or "timeout" in e:
-        return "🌐 **Fix:** Network error. Check your internet connection and try again."
-    if "environment" in e or "gemini_api_key" in e:
-        return "🔑 **Fix:** `GEMINI_API_KEY` is not set. Create a `.env` file with `GEMINI_API_KEY=your_key_here`."
-    return "📋 **Fix:** Copy the error above and check the Gemini API documentation."
+    return next((hint for keys, hint in _HINTS if any(k in e for k in keys)), _DEFAULT_HINT)
+
 
+@st.fragment
+def _render_session_info(session) -> None:
+    """Render session metrics in their own fragment - they only change after
+    a completed turn, so sidebar button clicks skip re-diffing these widgets."""
+    st.subheader("📊 Session Info")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Messages", get_message_count(session))
+    with col2:
+        st.metric("Tokens", session.total_tokens_used)
+    st.caption(st.session_state.session_id_caption)
 
+
+@st.fragment
 def _render_sidebar(config: dict) -> None:
-    """Render the sidebar with session info, debug panel, and controls."""
-    with st.sidebar:
-        st.title("🎯 CareerAI")
-        st.caption(config["app"]["description"])
-        st.divider()
+    """
+    Render the sidebar content: session info, debug panel, and controls.
+    Runs as a fragment so chat input doesn't re-render the whole sidebar;
+    actions that change the conversation escalate with st.rerun(scope="app").
+    Must be called from inside `with st.sidebar:` — fragments may not place
+    widgets into containers created outside their own body.
+    """
+    st.title("🎯 CareerAI")
+    st.caption(config["app"]["description"])
+    st.divider()
 
-        # ── API Status & Debug Panel ─────────────────────────────────
-        st.subheader("🔌 API Status")
-        if st.session_state.get("api_ready", False):
-            st.success("✅ Gemini API Connected")
-        else:
-            st.error("❌ API Not Connected")
-            err = st.session_state.get("api_error", "Unknown error")
-            st.code(err, language="text")
-            hint = _get_error_hint(err)
-            st.info(hint)
+    # ── API Status & Debug Panel ─────────────────────────────────
+    st.subheader("🔌 API Status")
+    if st.session_state.get("api_ready", False):
+        st.success("✅ Gemini API Connected")
+    else:
+        st.error("❌ API Not Connected")
+        err = st.session_state.get("api_error", "Unknown error")
+        st.code(err, language="text")
+        hint = _get_error_hint(err)
+        st.info(hint)
+
+        # Re-test button (useful after fixing .env)
+        if st.button("🔄 Re-test API Connection", use_container_width=True):
+            # Clear cached model so it re-initializes
+            clear_model_cache()
+            for key in ["api_ready", "api_error"]:
+                st.session_state.pop(key, None)
+            st.rerun(scope="app")
 
-            # Re-test button (useful after fixing .env)
-            if st.button("🔄 Re-test API Connection", use_container_width=True):
-                # Clear cached model so it re-initializes
-                for key in ["model", "api_ready", "api_error"]:
-                    st.session_state.pop(key, None)
-                st.rerun()
+    st.divider()
 
+    # ── Session Info ─────────────────────────────────────────────
+    if config["ui"]["show_session_info"]:
+        _render_session_info(st.session_state.session)
         st.divider()
 
-        # ── Session Info ─────────────────────────────────────────────
-        if config["ui"]["show_session_info"]:
-            session = st.session_state.session
-            st.subheader("📊 Session Info")
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("Messages", get_message_count(session))
-            with col2:
-                st.metric("Tokens", session.total_tokens_used)
-            st.caption(f"Session ID: `{session.session_id}`")
-            st.divider()
-
-        # ── Quick Prompts ─────────────────────────────────────────────
-        st.subheader("💡 Quick Topics")
-        quick_prompts = [
-            "Help me improve my resume",
-            "How to negotiate salary?",
-            "Prepare for a tech interview",
-            "Career change advice",
-            "Optimize my LinkedIn profile",
-        ]
-        for prompt in quick_prompts:
-            if st.button(f"→ {prompt}", use_container_width=True, key=f"qp_{prompt}"):
-                st.session_state.quick_prompt = prompt
+    # ── Quick Prompts ─────────────────────────────────────────────
+    st.subheader("💡 Quick Topics")
+    quick_prompts = [
+        "Help me improve my resume",
+        "How to negotiate salary?",
+        "Prepare for a tech interview",
+        "Career change advice",
+        "Optimize my LinkedIn profile",
+    ]
+    for prompt in quick_prompts:
+        if st.button(f"→ {prompt}", use_container_width=True, key=f"qp_{prompt}"):
+            st.session_state.quick_prompt = prompt
+            st.rerun(scope="app")
 
-        st.divider()
+    st.divider()
 
-        if st.button("🗑️ Clear Conversation", use_container_width=True):
-            clear_session(st.session_state.session)
-            st.session_state.messages_display = [
-                {"role": "assistant", "content": get_welcome_message()}
-            ]
-            st.rerun()
+    if st.button("🗑️ Clear Conversation", use_container_width=True):
+        clear_session(st.session_state.session)
+        st.session_state.messages_display = [
+            {"role": "assistant", "content": get_welcome_message()}
+        ]
+        st.rerun(scope="app")
 
-        st.caption(f"v{config['app']['version']} | Powered by Gemini")
+    st.caption(f"v{config['app']['version']} | Powered by Gemini")
 
 
+@st.fragment
 def _render_chat_messages(config: dict) -> None:
     """Render all messages. Uses only role strings — no emoji avatars."""
     for msg in st.session_state.messages_display:
@@ -133,6 +162,14 @@ def _render_chat_messages(config: dict) -> None:
             st.markdown(msg["content"])
 
 
+def _trim_messages_display(config: dict) -> None:
+    """Cap the rendered transcript so long sessions don't re-send an
+    ever-growing payload each rerun. API context is unaffected:
+    get_history_for_api windows the session to max_turns independently."""
+    max_display = config["ui"].get("max_message_display", 50)
+    st.session_state.messages_display = st.session_state.messages_display[-max_display:]
+
+
 def _handle_user_input(user_input: str, config: dict) -> None:
     """Process user input: display, call API, render response or real error."""
     if not user_input.strip():
@@ -142,9 +179,14 @@ def _handle_user_input(user_input: str, config: dict) -> None:
 
     # Show user message immediately
     st.session_state.messages_display.append({"role": "user", "content": user_input})
+    _trim_messages_display(config)
     with st.chat_message("user"):
         st.markdown(user_input)
 
+    # Snapshot history before appending the new user turn - the API payload
+    # appends user_input itself, so no trailing slice is needed later.
+    history = get_history_for_api(st.session_state.session, max_turns)
+
     add_message(st.session_state.session, "user", user_input)
 
     # Generate response
@@ -158,37 +200,25 @@ def _handle_user_input(user_input: str, config: dict) -> None:
             st.info(hint)
             return
 
-        with st.spinner("CareerAI is thinking..."):
-            history = get_history_for_api(st.session_state.session, max_turns)
-            history = history[:-1] if history else []
+        model = get_model()
 
-            result = send_message(
-                model=st.session_state.model,
-                user_message=user_input,
-                chat_history=history,
-            )
-
-        # ── Success ───────────────────────────────────────────────────
-        if result["success"] and result["text"]:
-            response_text = result["text"]
-            st.markdown(response_text)
-            if config["ui"]["show_token_usage"] and result["tokens_used"] > 0:
-                st.caption(f"🔢 Tokens used: {result['tokens_used']}")
-
-            st.session_state.messages_display.append(
-                {"role": "assistant", "content": response_text}
-            )
-            add_message(
-                st.session_state.session, "model", response_text, result["tokens_used"]
-            )
-            logger.info(
-                f"Turn complete | session={st.session_state.session.session_id} | "
-                f"tokens={result['tokens_used']}"
-            )
-
-        # ── Failure — show REAL error ─────────────────────────────────
-        else:
-            error_msg = result.get("error", "Unknown error")
+        # ── Stream the response incrementally ─────────────────────────
+        # While streaming, render plain text (no markdown parse per delta);
+        # promote to full markdown once the stream completes.
+        try:
+            placeholder = st.empty()
+            response_text = ""
+            usage = {"tokens": 0}
+            for delta in model.stream_chat(user_input, history, usage):
+                response_text += delta
+                placeholder.text(response_text)
+            placeholder.markdown(response_text)
+            tokens_used = usage["tokens"]
+        # Only catch expected API failures - Streamlit delivers control-flow
+        # exceptions (e.g. StopException when the user hits Stop) through the
+        # st.* calls above, and those must propagate.
+        except (requests.RequestException, RuntimeError, orjson.JSONDecodeError) as e:
+            error_msg = str(e)
             hint = _get_error_hint(error_msg)
             logger.error(f"API call failed: {error_msg}")
 
@@ -196,6 +226,23 @@ def _handle_user_input(user_input: str, config: dict) -> None:
             st.code(error_msg, language="text")
             st.info(hint)
             st.caption("Fix the error above, then click **Re-test API Connection** in the sidebar.")
+            return
+
+        # ── Success ───────────────────────────────────────────────────
+        if config["ui"]["show_token_usage"] and tokens_used > 0:
+            st.caption(f"🔢 Tokens used: {tokens_used}")
+
+        st.session_state.messages_display.append(
+            {"role": "assistant", "content": response_text}
+        )
+        _trim_messages_display(config)
+        add_message(
+            st.session_state.session, "model", response_text, tokens_used
+        )
+        logger.info(
+            f"Turn complete | session={st.session_state.session.session_id} | "
+            f"tokens={tokens_used}"
+        )
 
 
 def render_chat_interface(config: dict) -> None:
@@ -206,7 +253,8 @@ def render_chat_interface(config: dict) -> None:
     st.caption("AI-powered career guidance — resume tips, interview prep, job search strategies & more")
     st.divider()
 
-    _render_sidebar(config)
+    with st.sidebar:
+        _render_sidebar(config)
     _render_chat_messages(config)
 
     if "quick_prompt" in st.session_state:
@@ -5,6 +5,7 @@ Loads settings from config.yaml with env var overrides.
 
 import os
 import yaml
+import streamlit as st
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -13,8 +14,12 @@ load_dotenv()
 _CONFIG_PATH = Path(__file__).parent.parent.parent / "config.yaml"
 
 
-def load_config() -> dict:
-    """Load configuration from YAML file with environment variable overrides."""
+@st.cache_data
+def _load_config_cached(path_mtime: float) -> dict:
+    """
+    Parse config.yaml once and reuse across reruns/sessions.
+    `path_mtime` is the file's mtime, so editing config.yaml invalidates the cache.
+    """
     with open(_CONFIG_PATH, "r") as f:
         config = yaml.safe_load(f)
 
@@ -29,6 +34,11 @@ def load_config() -> dict:
     return config
 
 
+def load_config() -> dict:
+    """Load configuration from YAML file with environment variable overrides (cached)."""
+    return _load_config_cached(os.path.getmtime(_CONFIG_PATH))
+
+
 def get_api_key() -> str:
     """Retrieve Gemini API key from environment variables only (never hardcoded)."""
     api_key = os.getenv("GEMINI_API_KEY")
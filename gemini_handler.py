@@ -4,90 +4,162 @@ Uses gemini-2.5-flash from config.yaml directly (confirmed working).
 """
 
 import time
+import orjson
 import requests
+import streamlit as st
+from urllib3.util.retry import Retry
 
 from src.utils.config import get_api_key, load_config
 from src.utils.logger import setup_logger
-from src.prompts.career_prompts import build_system_prompt
+from src.prompts.career_prompts import SYSTEM_PROMPT
 
 logger = setup_logger(__name__)
-_config = load_config()
-_gemini_cfg = _config["gemini"]
 
 BASE = "https://generativelanguage.googleapis.com/v1beta"
 
+# Pooled session with keep-alive: reuses the TCP+TLS connection to the Gemini
+# endpoint across turns instead of paying a fresh handshake per request.
+# Transient 429/503 responses are retried with exponential backoff at the
+# adapter level, which covers the streaming path too (retries happen before
+# the first byte of the body is handed back). allowed_methods=None lifts
+# urllib3's default method allowlist, which excludes POST.
+_HTTP = requests.Session()
+_HTTP.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=1,
+        status_forcelist=(429, 503),
+        allowed_methods=None,
+    ),
+))
+
+# Coalesce SSE deltas before handing them to the UI: Gemini emits chunks every
+# ~20-50 ms and re-rendering per chunk is wasted work. Flush on whichever
+# threshold is hit first.
+_STREAM_FLUSH_SECS = 0.05
+_STREAM_FLUSH_CHARS = 16
+
+# Serialize payloads with orjson (bytes out, no intermediate str) instead of
+# letting requests fall back to stdlib json.dumps.
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# The system prompt is immutable module-level text, so build its payload
+# fragment once instead of re-wrapping the string on every request.
+_SYSTEM_INSTRUCTION = {"parts": [{"text": SYSTEM_PROMPT}]}
+
 
 class GeminiClient:
-    def __init__(self, api_key, model_name, system_prompt, gen_config):
+    def __init__(self, api_key, model_name, system_instruction, gen_config):
         self.api_key = api_key
         self.model_name = model_name
-        self.system_prompt = system_prompt
+        self.system_instruction = system_instruction
         self.gen_config = gen_config
 
-    def chat(self, user_message, history):
-        contents = []
-        for msg in history:
-            role = msg.get("role", "user")
-            parts = msg.get("parts", [])
-            text = parts[0].get("text", "") if parts and isinstance(parts[0], dict) else str(parts)
-            contents.append({"role": role, "parts": [{"text": text}]})
+    def _build_payload(self, user_message, history):
+        # History already arrives as {"role", "parts": [{"text"}]} dicts from
+        # session.get_history_for_api - no need to reshape it per call.
+        contents = list(history)
         contents.append({"role": "user", "parts": [{"text": user_message}]})
 
-        payload = {
+        return {
             "contents": contents,
-            "systemInstruction": {"parts": [{"text": self.system_prompt}]},
+            "systemInstruction": self.system_instruction,
             "generationConfig": self.gen_config,
         }
 
+    def chat(self, user_message, history):
+        payload = self._build_payload(user_message, history)
         url = f"{BASE}/models/{self.model_name}:generateContent?key={self.api_key}"
-        resp = requests.post(url, json=payload, timeout=30)
+        resp = _HTTP.post(url, data=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=30)
 
         if resp.status_code != 200:
-            err = resp.json().get("error", {}).get("message", resp.text)
+            err = orjson.loads(resp.content).get("error", {}).get("message", resp.text)
             raise RuntimeError(f"HTTP {resp.status_code}: {err}")
 
-        data = resp.json()
+        data = orjson.loads(resp.content)
         text = data["candidates"][0]["content"]["parts"][0]["text"]
         tokens = data.get("usageMetadata", {}).get("totalTokenCount", 0)
         return {"text": text, "tokens": tokens}
 
-
-def get_model():
-    """Use the model from config.yaml directly - no probing needed."""
-    api_key = get_api_key()
-    model_name = _gemini_cfg["model"]   # reads "gemini-2.5-flash" from config.yaml
-
+    def stream_chat(self, user_message, history, usage=None):
+        """
+        Yield text deltas from the SSE streaming endpoint as they arrive.
+        Pass a dict as `usage` to receive {"tokens": totalTokenCount} from the
+        final chunk once the stream is exhausted. The client is one cached
+        instance shared across sessions, so per-call results must live with
+        the caller, not on self.
+        """
+        payload = self._build_payload(user_message, history)
+        url = f"{BASE}/models/{self.model_name}:streamGenerateContent?alt=sse&key={self.api_key}"
+
+        buf = []
+        buf_len = 0
+        last_flush = time.monotonic()
+        with _HTTP.post(
+            url, data=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=60, stream=True
+        ) as resp:
+            if resp.status_code != 200:
+                err = orjson.loads(resp.content).get("error", {}).get("message", resp.text)
+                raise RuntimeError(f"HTTP {resp.status_code}: {err}")
+
+            for line in resp.iter_lines():
+                if not line.startswith(b"data: "):
+                    continue
+                chunk = orjson.loads(line[6:])
+                total = chunk.get("usageMetadata", {}).get("totalTokenCount")
+                if total and usage is not None:
+                    usage["tokens"] = total
+                for cand in chunk.get("candidates", []):
+                    for part in cand.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            buf.append(part["text"])
+                            buf_len += len(part["text"])
+
+                now = time.monotonic()
+                if buf and (now - last_flush >= _STREAM_FLUSH_SECS or buf_len >= _STREAM_FLUSH_CHARS):
+                    yield "".join(buf)
+                    buf.clear()
+                    buf_len = 0
+                    last_flush = now
+
+            # Stream drained normally: emit whatever is still buffered so the
+            # tail of the reply isn't lost. Not done in a finally block - a
+            # yield there would fire during GeneratorExit if the consumer
+            # abandons the stream and raise RuntimeError.
+            if buf:
+                yield "".join(buf)
+
+
+@st.cache_resource
+def _build_client(model_name, max_output_tokens, temperature, top_p, top_k):
+    """Build one GeminiClient shared across all sessions with these settings."""
     gen_config = {
-        "maxOutputTokens": _gemini_cfg["max_output_tokens"],
-        "temperature": _gemini_cfg["temperature"],
-        "topP": _gemini_cfg["top_p"],
-        "topK": _gemini_cfg["top_k"],
+        "maxOutputTokens": max_output_tokens,
+        "temperature": temperature,
+        "topP": top_p,
+        "topK": top_k,
     }
-
     logger.info(f"GeminiClient ready | model={model_name}")
-    return GeminiClient(api_key, model_name, build_system_prompt(), gen_config)
-
-
-def send_message(model, user_message, chat_history, max_retries=2):
-    for attempt in range(max_retries + 1):
-        try:
-            t0 = time.time()
-            result = model.chat(user_message, chat_history)
-            logger.info(f"OK | tokens={result['tokens']} | {round(time.time()-t0, 2)}s")
-            return {
-                "text": result["text"],
-                "tokens_used": result["tokens"],
-                "success": True,
-                "error": None,
-            }
-        except Exception as e:
-            err = str(e)
-            logger.error(f"Attempt {attempt+1} failed: {err[:120]}")
-            if attempt < max_retries and ("429" in err or "503" in err):
-                time.sleep(2 ** attempt)
-                continue
-            return {"text": None, "tokens_used": 0, "success": False, "error": err}
-    return {"text": None, "tokens_used": 0, "success": False, "error": "Max retries exceeded."}
+    return GeminiClient(get_api_key(), model_name, _SYSTEM_INSTRUCTION, gen_config)
+
+
+def get_model():
+    """Use the model from config.yaml directly - no probing needed."""
+    gemini_cfg = load_config()["gemini"]  # st.cache_data-backed, no repeated parse
+    return _build_client(
+        gemini_cfg["model"],   # reads "gemini-2.5-flash" from config.yaml
+        gemini_cfg["max_output_tokens"],
+        gemini_cfg["temperature"],
+        gemini_cfg["top_p"],
+        gemini_cfg["top_k"],
+    )
+
+
+def clear_model_cache():
+    """Drop the cached client so the next get_model() rebuilds it (e.g. after fixing .env)."""
+    _build_client.clear()
 
 
 def validate_api_connection():
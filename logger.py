@@ -10,21 +10,20 @@ from pathlib import Path
 LOG_DIR = Path(__file__).parent.parent.parent / "logs"
 LOG_DIR.mkdir(exist_ok=True)
 
-_configured = False
-
-
 def setup_logger(name: str) -> logging.Logger:
-    global _configured
     logger = logging.getLogger(name)
+    root = logging.getLogger()
 
-    if not _configured:
+    if not root.handlers:
         log_level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
         fmt = "%(asctime)s | %(name)s | %(levelname)s | %(message)s"
 
-        # Console handler - UTF-8 forced to prevent Windows cp1252 crash
-        console_handler = logging.StreamHandler(
-            stream=open(sys.stdout.fileno(), mode='w', encoding='utf-8', buffering=1, closefd=False)
-        )
+        # Console handler - UTF-8 forced to prevent Windows cp1252 crash.
+        # Reconfigure stdout in place instead of re-opening its fd, which
+        # leaked a new file object per setup call.
+        if hasattr(sys.stdout, "reconfigure"):
+            sys.stdout.reconfigure(encoding="utf-8")
+        console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(logging.Formatter(fmt))
         console_handler.setLevel(log_level)
 
@@ -33,10 +32,8 @@ def setup_logger(name: str) -> logging.Logger:
         file_handler.setFormatter(logging.Formatter(fmt))
         file_handler.setLevel(log_level)
 
-        root = logging.getLogger()
         root.setLevel(log_level)
         root.addHandler(console_handler)
         root.addHandler(file_handler)
-        _configured = True
 
     return logger
\ No newline at end of file
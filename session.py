@@ -3,7 +3,8 @@ Session management for multi-turn conversation memory.
 Manages chat history, context window, and session metadata.
 """
 
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 from dataclasses import dataclass, field
 from typing import Optional
 import uuid
@@ -13,8 +14,14 @@ import uuid
 class Message:
     role: str          # "user" or "model"
     content: str
-    timestamp: datetime = field(default_factory=datetime.utcnow)
+    timestamp_ns: int = field(default_factory=time.time_ns)
     token_count: Optional[int] = None
+    api_dict: Optional[dict] = field(default=None)  # Gemini API format, built once
+
+    @property
+    def timestamp(self) -> datetime:
+        """Materialize the creation time lazily; stored as an int for cheap construction."""
+        return datetime.fromtimestamp(self.timestamp_ns / 1e9, tz=timezone.utc)
 
 
 @dataclass
@@ -32,17 +39,19 @@ def create_session() -> Session:
 
 def add_message(session: Session, role: str, content: str, tokens: int = 0) -> None:
     """Append a message to the session history."""
-    session.messages.append(Message(role=role, content=content))
+    msg = Message(role=role, content=content)
+    msg.api_dict = {"role": role, "parts": [{"text": content}]}
+    session.messages.append(msg)
     session.total_tokens_used += tokens
 
 
 def get_history_for_api(session: Session, max_turns: int = 20) -> list[dict]:
     """
-    Convert session messages to Gemini API format.
-    Returns the last `max_turns` exchanges (user+model pairs).
+    Return the last `max_turns` exchanges (user+model pairs) in Gemini API
+    format. Each message's API dict is built once in add_message, so this is
+    just a slice of stable references - no per-turn reallocation.
     """
-    messages = session.messages[-(max_turns * 2):]
-    return [{"role": msg.role, "parts": [{"text": msg.content}]} for msg in messages]
+    return [msg.api_dict for msg in session.messages[-(max_turns * 2):]]
 
 
 def get_message_count(session: Session) -> int: